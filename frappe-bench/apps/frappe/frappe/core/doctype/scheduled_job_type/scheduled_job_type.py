@@ -1,9 +1,11 @@
 # Copyright (c) 2021, Frappe Technologies and contributors
 # License: MIT. See LICENSE
 
+import copy
 import hashlib
 import json
 from datetime import datetime
+from functools import cache, lru_cache
 
 import click
 from croniter import CroniterBadCronError, croniter
@@ -12,7 +14,20 @@ import frappe
 from frappe import _
 from frappe.model.document import Document
 from frappe.utils import get_datetime, now_datetime
-from frappe.utils.background_jobs import enqueue, is_job_enqueued
+from frappe.utils.background_jobs import enqueue
+
+CRON_MAP = {
+	"Yearly": "0 0 1 1 *",
+	"Annual": "0 0 1 1 *",
+	"Monthly": "0 0 1 * *",
+	"Monthly Long": "0 0 1 * *",
+	"Weekly": "0 0 * * 0",
+	"Weekly Long": "0 0 * * 0",
+	"Daily": "0 0 * * *",
+	"Daily Long": "0 0 * * *",
+	"Hourly": "0 * * * *",
+	"Hourly Long": "0 * * * *",
+}
 
 
 class ScheduledJobType(Document):
@@ -71,18 +86,15 @@ class ScheduledJobType(Document):
 	def enqueue(self, force=False) -> bool:
 		# enqueue event if last execution is done
 		if self.is_event_due() or force:
-			if not self.is_job_in_queue():
-				enqueue(
-					"frappe.core.doctype.scheduled_job_type.scheduled_job_type.run_scheduled_job",
-					queue=self.get_queue_name(),
-					job_type=self.method,
-					job_id=self.rq_job_id,
-				)
-				return True
-			else:
-				frappe.logger("scheduler").error(
-					f"Skipped queueing {self.method} because it was found in queue for {frappe.local.site}"
-				)
+			# job is not re-queued if it is still queued or running, enqueue logs the skip
+			job = enqueue(
+				"frappe.core.doctype.scheduled_job_type.scheduled_job_type.run_scheduled_job",
+				queue=self.get_queue_name(),
+				job_type=self.method,
+				job_id=self.rq_job_id,
+				deduplicate=True,
+			)
+			return job is not None
 
 		return False
 
@@ -91,9 +103,6 @@ class ScheduledJobType(Document):
 		# if the next scheduled event is before NOW, then its due!
 		return self.get_next_execution() <= (current_time or now_datetime())
 
-	def is_job_in_queue(self) -> bool:
-		return is_job_enqueued(self.rq_job_id)
-
 	@property
 	def rq_job_id(self):
 		"""Unique ID created to deduplicate jobs with single RQ call."""
@@ -104,30 +113,8 @@ class ScheduledJobType(Document):
 		return self.get_next_execution()
 
 	def get_next_execution(self):
-		# Maintenance jobs run at random time, the time is specific to the site though.
-		# This is done to avoid scheduling all maintenance task on all sites at the same time in
-		# multitenant deployments.
-		hourly_site_offset = int(hashlib.sha1(frappe.local.site.encode()).hexdigest(), 16) % 60
-		daily_site_offset = (hourly_site_offset + 30) % 60
-
-		CRON_MAP = {
-			"Yearly": "0 0 1 1 *",
-			"Annual": "0 0 1 1 *",
-			"Monthly": "0 0 1 * *",
-			"Monthly Long": "0 0 1 * *",
-			"Weekly": "0 0 * * 0",
-			"Weekly Long": "0 0 * * 0",
-			"Daily": "0 0 * * *",
-			"Daily Long": "0 0 * * *",
-			"Daily Maintenance": f"{daily_site_offset} 0 * * *",
-			"Hourly": "0 * * * *",
-			"Hourly Long": "0 * * * *",
-			"Hourly Maintenance": f"{hourly_site_offset} * * * *",
-			"All": f"*/{(frappe.get_conf().scheduler_interval or 240) // 60} * * * *",
-		}
-
 		if not self.cron_format:
-			self.cron_format = CRON_MAP.get(self.frequency)
+			self.cron_format = get_cron_format(self.frequency)
 
 		# If this is a cold start then last_execution will not be set.
 		# Creation is set as fallback because if very old fallback is set job might trigger
@@ -135,7 +122,7 @@ class ScheduledJobType(Document):
 		# A dynamic fallback like current time might miss the scheduler interval and job will never start.
 		last_execution = get_datetime(self.last_execution or self.creation)
 
-		return croniter(self.cron_format, last_execution).get_next(datetime)
+		return get_next_fire_time(self.cron_format, last_execution)
 
 	def execute(self):
 		self.scheduler_log = None
@@ -181,7 +168,7 @@ class ScheduledJobType(Document):
 		return "long" if ("Long" in self.frequency or "Maintenance" in self.frequency) else "default"
 
 	def on_trash(self):
-		frappe.db.delete("Scheduled Job Log", {"scheduled_job_type": self.name})
+		delete_scheduled_job_logs([self.name])
 
 
 @frappe.whitelist()
@@ -192,6 +179,53 @@ def execute_event(doc: str):
 	return doc
 
 
+def get_cron_format(frequency: str) -> str | None:
+	if cron_format := CRON_MAP.get(frequency):
+		return cron_format
+
+	# Maintenance jobs run at random time, the time is specific to the site though.
+	# This is done to avoid scheduling all maintenance task on all sites at the same time in
+	# multitenant deployments.
+	if frequency == "Hourly Maintenance":
+		hourly_site_offset, __ = get_site_offsets(frappe.local.site)
+		return f"{hourly_site_offset} * * * *"
+
+	if frequency == "Daily Maintenance":
+		__, daily_site_offset = get_site_offsets(frappe.local.site)
+		return f"{daily_site_offset} 0 * * *"
+
+	if frequency == "All":
+		return f"*/{(frappe.get_conf().scheduler_interval or 240) // 60} * * * *"
+
+
+@cache
+def get_site_offsets(site: str) -> tuple[int, int]:
+	"""Return the (hourly, daily) minute offsets of maintenance jobs for a site."""
+	digest = hashlib.blake2b(site.encode(), digest_size=8).digest()
+	hourly_site_offset = int.from_bytes(digest, "big") % 60
+	return hourly_site_offset, (hourly_site_offset + 30) % 60
+
+
+@lru_cache(maxsize=512)
+def _parsed_cron(cron_format: str) -> croniter:
+	return croniter(cron_format)
+
+
+# one live entry per job per site is needed on multi-tenant benches, stale entries from earlier
+# `last_execution` values age out. 32k entries stay well under 10MB per worker.
+@lru_cache(maxsize=32768)
+def get_next_fire_time(cron_format: str, last_execution: datetime) -> datetime:
+	"""Return the next time `cron_format` fires after `last_execution`.
+
+	Parsing a cron expression is far more expensive than evaluating it, so parsed expressions are
+	cached and a shallow copy is advanced from `last_execution` instead of re-parsing every tick.
+
+	The result only changes once a job runs and its `last_execution` moves, so it is memoized too:
+	on most scheduler ticks checking whether a job is due is just a cache lookup."""
+	cron = copy.copy(_parsed_cron(cron_format))
+	return cron.get_next(datetime, start_time=last_execution)
+
+
 def run_scheduled_job(job_type: str):
 	"""This is a wrapper function that runs a hooks.scheduler_events method"""
 	if frappe.conf.maintenance_mode:
@@ -205,41 +239,53 @@ def run_scheduled_job(job_type: str):
 def sync_jobs(hooks: dict | None = None):
 	frappe.reload_doc("core", "doctype", "scheduled_job_type")
 	scheduler_events = hooks or frappe.get_hooks("scheduler_events")
-	all_events = insert_events(scheduler_events)
+	existing_jobs = get_existing_jobs()
+	all_events = insert_events(scheduler_events, existing_jobs=existing_jobs)
 	clear_events(all_events)
 
 
-def insert_events(scheduler_events: dict) -> list:
+def get_existing_jobs() -> dict[str, frappe._dict]:
+	"""Return all Scheduled Job Types keyed by method, loaded in a single query."""
+	return {
+		job.method: job
+		for job in frappe.get_all(
+			"Scheduled Job Type",
+			fields=["name", "method", "frequency", "cron_format"],
+		)
+	}
+
+
+def insert_events(scheduler_events: dict, *, existing_jobs: dict) -> list:
 	cron_jobs, event_jobs = [], []
 	for event_type in scheduler_events:
 		events = scheduler_events.get(event_type)
 		if isinstance(events, dict):
-			cron_jobs += insert_cron_jobs(events)
+			cron_jobs += insert_cron_jobs(events, existing_jobs=existing_jobs)
 		else:
 			# hourly, daily etc
-			event_jobs += insert_event_jobs(events, event_type)
+			event_jobs += insert_event_jobs(events, event_type, existing_jobs=existing_jobs)
 	return cron_jobs + event_jobs
 
 
-def insert_cron_jobs(events: dict) -> list:
+def insert_cron_jobs(events: dict, *, existing_jobs: dict) -> list:
 	cron_jobs = []
 	for cron_format in events:
 		for event in events.get(cron_format):
 			cron_jobs.append(event)
-			insert_single_event("Cron", event, cron_format)
+			insert_single_event("Cron", event, cron_format, existing_jobs=existing_jobs)
 	return cron_jobs
 
 
-def insert_event_jobs(events: list, event_type: str) -> list:
+def insert_event_jobs(events: list, event_type: str, *, existing_jobs: dict) -> list:
 	event_jobs = []
 	for event in events:
 		event_jobs.append(event)
 		frequency = event_type.replace("_", " ").title()
-		insert_single_event(frequency, event)
+		insert_single_event(frequency, event, existing_jobs=existing_jobs)
 	return event_jobs
 
 
-def insert_single_event(frequency: str, event: str, cron_format: str | None = ""):
+def insert_single_event(frequency: str, event: str, cron_format: str | None = "", *, existing_jobs: dict):
 	try:
 		frappe.get_attr(event)
 	except Exception as e:
@@ -248,15 +294,15 @@ def insert_single_event(frequency: str, event: str, cron_format: str | None = ""
 
 	doc: ScheduledJobType
 
-	if job_name := frappe.db.exists("Scheduled Job Type", {"method": event}):
-		doc = frappe.get_doc("Scheduled Job Type", job_name)
-
+	if job := existing_jobs.get(event):
 		# Update only frequency and cron_format fields if they are different
 		# Maintain existing values of other fields
-		if doc.frequency != frequency or doc.cron_format != cron_format:
+		if job.frequency != frequency or (job.cron_format or "") != (cron_format or ""):
+			doc = frappe.get_doc("Scheduled Job Type", job.name)
 			doc.cron_format = cron_format
 			doc.frequency = frequency
 			doc.save()
+			job.update(frequency=frequency, cron_format=cron_format)
 	else:
 		doc = frappe.get_doc(
 			{
@@ -276,16 +322,28 @@ def insert_single_event(frequency: str, event: str, cron_format: str | None = ""
 			doc.delete()
 			doc.insert()
 
+		existing_jobs[event] = frappe._dict(
+			name=doc.name, method=event, frequency=frequency, cron_format=cron_format
+		)
 
-def clear_events(all_events: list):
-	for event in frappe.get_all(
-		"Scheduled Job Type", fields=["name", "method", "server_script", "scheduler_event"]
-	):
-		is_server_script = event.server_script
-		is_defined_in_hooks = event.method in all_events
-
-		if event.scheduler_event:
-			continue
 
-		if not (is_defined_in_hooks or is_server_script):
-			frappe.delete_doc("Scheduled Job Type", event.name)
+def clear_events(all_events: list):
+	# jobs created from server scripts or scheduler events aren't defined in hooks
+	to_delete = frappe.get_all(
+		"Scheduled Job Type",
+		filters={
+			"scheduler_event": ["is", "not set"],
+			"server_script": ["is", "not set"],
+			"method": ["not in", all_events],
+		},
+		pluck="name",
+	)
+
+	if to_delete:
+		# bulk delete skips on_trash, so clean up logs the same way it does
+		delete_scheduled_job_logs(to_delete)
+		frappe.db.delete("Scheduled Job Type", {"name": ["in", to_delete]})
+
+
+def delete_scheduled_job_logs(job_types: list[str]):
+	frappe.db.delete("Scheduled Job Log", {"scheduled_job_type": ["in", job_types]})
@@ -3,7 +3,11 @@
 from datetime import timedelta
 
 import frappe
-from frappe.core.doctype.scheduled_job_type.scheduled_job_type import sync_jobs
+from frappe.core.doctype.scheduled_job_type.scheduled_job_type import (
+	_parsed_cron,
+	get_next_fire_time,
+	sync_jobs,
+)
 from frappe.tests.utils import FrappeTestCase
 from frappe.utils import get_datetime
 from frappe.utils.data import add_to_date, now_datetime
@@ -77,6 +81,49 @@ class TestScheduledJobType(FrappeTestCase):
 		self.assertFalse(job.is_event_due(get_datetime("2019-01-01 00:05:06")))
 		self.assertFalse(job.is_event_due(get_datetime("2019-01-01 00:09:59")))
 
+	def test_cached_cron_is_not_shared(self):
+		# parsed expressions are cached, evaluating them must not advance the cached instance
+		cron_format = "*/10 * * * *"
+		parsed_cron = _parsed_cron(cron_format)
+		cur = parsed_cron.cur
+
+		get_next_fire_time.cache_clear()
+		self.assertEqual(
+			get_next_fire_time(cron_format, get_datetime("2019-01-01 00:00:00")),
+			get_datetime("2019-01-01 00:10:00"),
+		)
+		self.assertIs(_parsed_cron(cron_format), parsed_cron)
+		self.assertEqual(parsed_cron.cur, cur)
+
+	def test_next_execution_follows_last_execution(self):
+		job = frappe.get_doc(
+			"Scheduled Job Type", dict(method="frappe.email.doctype.email_account.email_account.pull")
+		)
+		job.db_set("last_execution", "2019-01-01 00:00:00")
+		self.assertTrue(job.is_event_due(get_datetime("2019-01-01 00:10:01")))
+
+		# memoized next execution must move along with last execution
+		job.db_set("last_execution", "2019-01-01 00:10:00")
+		self.assertFalse(job.is_event_due(get_datetime("2019-01-01 00:10:01")))
+		self.assertTrue(job.is_event_due(get_datetime("2019-01-01 00:20:01")))
+
+	def test_sync_jobs_clears_stale_jobs(self):
+		def make_job(method, **kwargs):
+			job = frappe.get_doc(doctype="Scheduled Job Type", method=method, frequency="Daily", **kwargs)
+			return job.insert(ignore_links=True).name
+
+		stale_job = make_job("frappe.tests.removed_from_hooks")
+		server_script_job = make_job("_Test Server Script Job", server_script="_Test Server Script")
+		scheduler_event_job = make_job("_Test Scheduler Event Job", scheduler_event="_Test Scheduler Event")
+		frappe.get_doc(doctype="Scheduled Job Log", scheduled_job_type=stale_job, status="Complete").insert()
+
+		sync_jobs()
+
+		self.assertFalse(frappe.db.exists("Scheduled Job Type", stale_job))
+		self.assertFalse(frappe.db.exists("Scheduled Job Log", {"scheduled_job_type": stale_job}))
+		self.assertTrue(frappe.db.exists("Scheduled Job Type", server_script_job))
+		self.assertTrue(frappe.db.exists("Scheduled Job Type", scheduler_event_job))
+
 	def test_maintenance_jobs(self):
 		sjt = frappe.new_doc(
 			"Scheduled Job Type",
@@ -1,7 +1,9 @@
 import os
 import time
 from unittest import TestCase
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
+
+from rq.job import JobStatus
 
 import frappe
 from frappe.core.doctype.scheduled_job_type.scheduled_job_type import ScheduledJobType, sync_jobs
@@ -52,7 +54,10 @@ class TestScheduler(TestCase):
 	def test_queue_peeking(self):
 		job = get_test_job()
 
-		with patch.object(job, "is_job_in_queue", return_value=True):
+		queued_job = MagicMock()
+		queued_job.get_status.return_value = JobStatus.QUEUED
+
+		with patch("frappe.utils.background_jobs.get_job", return_value=queued_job):
 			# 1st job is in the queue (or running), don't enqueue it again
 			self.assertFalse(job.enqueue())
 
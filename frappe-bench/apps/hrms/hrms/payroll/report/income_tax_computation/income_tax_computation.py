@@ -22,6 +22,7 @@ class IncomeTaxComputationReport:
 		self.employees = frappe._dict()
 		self.payroll_period_start_date = None
 		self.payroll_period_end_date = None
+		self.salary_slip_end_dates = {}
 		if self.filters.payroll_period:
 			self.payroll_period_start_date, self.payroll_period_end_date = frappe.db.get_value(
 				"Payroll Period", self.filters.payroll_period, ["start_date", "end_date"]
@@ -34,6 +35,8 @@ class IncomeTaxComputationReport:
 
 	def get_data(self):
 		self.get_employee_details()
+		self.employee_ids = list(self.employees)
+		self.get_last_salary_slips()
 		self.get_future_salary_slips()
 		self.get_gross_earnings()
 		self.get_income_from_other_sources()
@@ -63,9 +66,8 @@ class IncomeTaxComputationReport:
 		ss_assignments = self.get_ss_assignments([d.employee for d in employees])
 
 		for d in employees:
-			if d.employee in list(ss_assignments.keys()):
-				d.update(ss_assignments[d.employee])
-				self.employees.setdefault(d.employee, d)
+			if ss_assignment := ss_assignments.get(d.employee):
+				self.employees.setdefault(d.employee, d.update(ss_assignment))
 
 		if not self.employees:
 			frappe.throw(_("No employees found with selected filters and active salary structure"))
@@ -102,49 +104,58 @@ class IncomeTaxComputationReport:
 			order_by="from_date desc",
 		)
 
+		tax_slabs = dict(
+			frappe.get_all(
+				"Income Tax Slab",
+				filters={"name": ["in", list({d.income_tax_slab for d in ss_assignments})], "disabled": 0},
+				fields=["name", "allow_tax_exemption"],
+				as_list=1,
+			)
+		)
+
+		# assignments are ordered by from_date, so the first one with an enabled tax slab is the latest
 		employee_ss_assignments = frappe._dict()
 		for d in ss_assignments:
-			if d.employee not in list(employee_ss_assignments.keys()):
-				tax_slab = frappe.get_cached_value(
-					"Income Tax Slab", d.income_tax_slab, ["allow_tax_exemption", "disabled"], as_dict=1
-				)
+			if d.employee in employee_ss_assignments or d.income_tax_slab not in tax_slabs:
+				continue
 
-				if tax_slab and not tax_slab.disabled:
-					employee_ss_assignments.setdefault(
-						d.employee,
-						{
-							"salary_structure": d.salary_structure,
-							"income_tax_slab": d.income_tax_slab,
-							"allow_tax_exemption": tax_slab.allow_tax_exemption,
-							"taxable_earnings_till_date": d.taxable_earnings_till_date or 0.0,
-							"tax_deducted_till_date": d.tax_deducted_till_date or 0.0,
-						},
-					)
+			employee_ss_assignments[d.employee] = {
+				"salary_structure": d.salary_structure,
+				"income_tax_slab": d.income_tax_slab,
+				"allow_tax_exemption": tax_slabs[d.income_tax_slab],
+				"taxable_earnings_till_date": d.taxable_earnings_till_date or 0.0,
+				"tax_deducted_till_date": d.tax_deducted_till_date or 0.0,
+			}
 		return employee_ss_assignments
 
 	def get_future_salary_slips(self):
 		self.future_salary_slips = frappe._dict()
-		for employee in list(self.employees.keys()):
+		payroll_period_end_date = getdate(self.payroll_period_end_date)
+		for employee, emp_details in self.employees.items():
 			last_ss = self.get_last_salary_slip(employee)
-			if last_ss and last_ss.end_date == self.payroll_period_end_date:
+			if last_ss and getdate(last_ss.end_date) >= payroll_period_end_date:
 				continue
 
-			relieving_date = self.employees[employee].get("relieving_date", "")
 			if last_ss:
-				ss_start_date = add_days(last_ss.end_date, 1)
+				ss_start_date = getdate(add_days(last_ss.end_date, 1))
 			else:
-				ss_start_date = self.payroll_period_start_date
+				ss_start_date = getdate(self.payroll_period_start_date)
 				last_ss = frappe._dict(
 					{
 						"payroll_frequency": "Monthly",
-						"salary_structure": self.employees[employee].get("salary_structure"),
+						"salary_structure": emp_details.get("salary_structure"),
 					}
 				)
 
-			while getdate(ss_start_date) < getdate(self.payroll_period_end_date) and (
-				not relieving_date or getdate(ss_start_date) < relieving_date
+			# employee leaves before the next slip would start
+			relieving_date = emp_details.get("relieving_date") and getdate(emp_details.relieving_date)
+			if relieving_date and relieving_date <= ss_start_date:
+				continue
+
+			while ss_start_date < payroll_period_end_date and (
+				not relieving_date or ss_start_date < relieving_date
 			):
-				ss_end_date = get_start_end_dates(last_ss.payroll_frequency, ss_start_date).end_date
+				ss_end_date = self.get_salary_slip_end_date(last_ss.payroll_frequency, ss_start_date)
 
 				ss = frappe.new_doc("Salary Slip")
 				ss.employee = employee
@@ -159,22 +170,44 @@ class IncomeTaxComputationReport:
 				except Exception:
 					break
 
-				ss_start_date = add_days(ss_end_date, 1)
+				ss_start_date = getdate(add_days(ss_end_date, 1))
 
-	def get_last_salary_slip(self, employee):
-		last_salary_slip = frappe.db.get_value(
-			"Salary Slip",
-			{
-				"employee": employee,
-				"docstatus": 1,
-				"start_date": ["between", [self.payroll_period_start_date, self.payroll_period_end_date]],
-			},
-			["name", "start_date", "end_date", "salary_structure", "payroll_frequency"],
-			order_by="start_date desc",
-			as_dict=1,
-		)
+	def get_salary_slip_end_date(self, payroll_frequency, start_date):
+		# Slip periods only depend on frequency and start date, so most employees share them
+		key = (payroll_frequency, getdate(start_date))
+		if key not in self.salary_slip_end_dates:
+			self.salary_slip_end_dates[key] = get_start_end_dates(payroll_frequency, start_date).end_date
+
+		return self.salary_slip_end_dates[key]
+
+	def get_last_salary_slips(self):
+		# Fetch the latest submitted salary slip of every employee in one query
+		ss = frappe.qb.DocType("Salary Slip")
+		records = (
+			frappe.qb.from_(ss)
+			.select(
+				ss.employee,
+				ss.name,
+				ss.start_date,
+				ss.end_date,
+				ss.salary_structure,
+				ss.payroll_frequency,
+				ss.annual_taxable_amount,
+				ss.tax_exemption_declaration,
+				ss.standard_tax_exemption_amount,
+			)
+			.where(ss.docstatus == 1)
+			.where(ss.employee.isin(self.employee_ids))
+			.where(ss.start_date.between(self.payroll_period_start_date, self.payroll_period_end_date))
+			.orderby(ss.start_date, order=frappe.qb.desc)
+		).run(as_dict=True)
 
-		return last_salary_slip
+		self.last_salary_slips = frappe._dict()
+		for d in records:
+			self.last_salary_slips.setdefault(d.pop("employee"), d)
+
+	def get_last_salary_slip(self, employee):
+		return self.last_salary_slips.get(employee)
 
 	def get_gross_earnings(self):
 		# Get total earnings from existing salary slip
@@ -184,7 +217,7 @@ class IncomeTaxComputationReport:
 				frappe.qb.from_(ss)
 				.select(ss.employee, Sum(ss.base_gross_pay).as_("amount"))
 				.where(ss.docstatus == 1)
-				.where(ss.employee.isin(list(self.employees.keys())))
+				.where(ss.employee.isin(self.employee_ids))
 				.where(ss.start_date >= self.payroll_period_start_date)
 				.where(ss.end_date <= self.payroll_period_end_date)
 				.groupby(ss.employee)
@@ -198,7 +231,7 @@ class IncomeTaxComputationReport:
 				flt(opening_taxable_earnings) + flt(existing_ss.get(employee)) + future_ss_earnings
 			)
 
-			self.employees[employee].setdefault("gross_earnings", gross_earnings)
+			employee_details.setdefault("gross_earnings", gross_earnings)
 
 	def get_future_earnings(self, employee):
 		future_earnings = 0.0
@@ -213,6 +246,8 @@ class IncomeTaxComputationReport:
 		if not tax_exempted_components:
 			return
 
+		self.component_fieldnames = {d: scrub(d) for d in tax_exempted_components}
+
 		# Get component totals from existing salary slips
 		ss = frappe.qb.DocType("Salary Slip")
 		ss_comps = frappe.qb.DocType("Salary Detail")
@@ -223,7 +258,7 @@ class IncomeTaxComputationReport:
 			.on(ss.name == ss_comps.parent)
 			.select(ss.name, ss.employee, ss_comps.salary_component, Sum(ss_comps.amount).as_("amount"))
 			.where(ss.docstatus == 1)
-			.where(ss.employee.isin(list(self.employees.keys())))
+			.where(ss.employee.isin(self.employee_ids))
 			.where(ss_comps.do_not_include_in_total == 0)
 			.where(ss_comps.salary_component.isin(tax_exempted_components))
 			.where(ss.start_date >= self.payroll_period_start_date)
@@ -233,50 +268,59 @@ class IncomeTaxComputationReport:
 
 		existing_ss_exemptions = frappe._dict()
 		for d in records:
-			existing_ss_exemptions.setdefault(d.employee, {}).setdefault(scrub(d.salary_component), d.amount)
+			existing_ss_exemptions.setdefault(d.employee, {}).setdefault(
+				self.component_fieldnames[d.salary_component], d.amount
+			)
 
-		for employee in list(self.employees.keys()):
-			if not self.employees[employee]["allow_tax_exemption"]:
+		for employee, emp_details in self.employees.items():
+			if not emp_details["allow_tax_exemption"]:
 				continue
 
 			exemptions = existing_ss_exemptions.get(employee, {})
-			self.add_exemptions_from_future_salary_slips(employee, exemptions)
-			self.employees[employee].update(exemptions)
-
-			total_exemptions = sum(list(exemptions.values()))
-			self.employees[employee]["total_exemption"] = 0
-			self.employees[employee]["total_exemption"] += total_exemptions
+			exemptions, total_exemption = self.add_exemptions_from_future_salary_slips(employee, exemptions)
+			emp_details.update(exemptions)
+			emp_details["total_exemption"] = total_exemption
 
 	def add_exemptions_from_future_salary_slips(self, employee, exemptions):
+		"""Add exempted components of future salary slips to `exemptions`,
+		returns the updated exemptions and their total"""
+		total_exemption = sum(exemptions.values())
+
+		# slips may carry components outside the exempted list, e.g. disabled ones
+		component_fieldnames = self.component_fieldnames
 		for ss in self.future_salary_slips.get(employee, []):
 			for e in ss.earnings:
 				if not e.is_tax_applicable:
-					exemptions.setdefault(scrub(e.salary_component), 0)
-					exemptions[scrub(e.salary_component)] += flt(e.amount)
+					fieldname = component_fieldnames.get(e.salary_component) or scrub(e.salary_component)
+					exemptions.setdefault(fieldname, 0)
+					exemptions[fieldname] += flt(e.amount)
+					total_exemption += flt(e.amount)
 
 			for d in ss.deductions:
 				if d.exempted_from_income_tax:
-					exemptions.setdefault(scrub(d.salary_component), 0)
-					exemptions[scrub(d.salary_component)] += flt(d.amount)
+					fieldname = component_fieldnames.get(d.salary_component) or scrub(d.salary_component)
+					exemptions.setdefault(fieldname, 0)
+					exemptions[fieldname] += flt(d.amount)
+					total_exemption += flt(d.amount)
 
-		return exemptions
+		return exemptions, total_exemption
 
 	def get_tax_exempted_components(self):
-		# nontaxable earning components
-		nontaxable_earning_components = [
-			d.name
-			for d in frappe.get_all(
-				"Salary Component", {"type": "Earning", "is_tax_applicable": 0, "disabled": 0}
+		# nontaxable earning components and tax exempted deduction components
+		SalaryComponent = frappe.qb.DocType("Salary Component")
+		components = (
+			frappe.qb.from_(SalaryComponent)
+			.select(SalaryComponent.name, SalaryComponent.type)
+			.where(SalaryComponent.disabled == 0)
+			.where(
+				((SalaryComponent.type == "Earning") & (SalaryComponent.is_tax_applicable == 0))
+				| ((SalaryComponent.type == "Deduction") & (SalaryComponent.exempted_from_income_tax == 1))
 			)
-		]
+			.orderby(SalaryComponent.modified, order=frappe.qb.desc)
+		).run(as_dict=True)
 
-		# tax exempted deduction components
-		tax_exempted_deduction_components = [
-			d.name
-			for d in frappe.get_all(
-				"Salary Component", {"type": "Deduction", "exempted_from_income_tax": 1, "disabled": 0}
-			)
-		]
+		nontaxable_earning_components = [d.name for d in components if d.type == "Earning"]
+		tax_exempted_deduction_components = [d.name for d in components if d.type == "Deduction"]
 
 		tax_exempted_components = nontaxable_earning_components + tax_exempted_deduction_components
 
@@ -292,39 +336,38 @@ class IncomeTaxComputationReport:
 		for d in exemption_categories:
 			self.add_column(d.name)
 
-		self.employees_with_proofs = []
-		self.get_tax_exemptions("Employee Tax Exemption Proof Submission")
-		if self.filters.consider_tax_exemption_declaration:
-			self.get_tax_exemptions("Employee Tax Exemption Declaration")
-
-	def get_tax_exemptions(self, source):
-		# Get category-wise exmeptions based on submitted proofs or declarations
-		if source == "Employee Tax Exemption Proof Submission":
-			child_doctype = "Employee Tax Exemption Proof Submission Detail"
-		else:
-			child_doctype = "Employee Tax Exemption Declaration Category"
+		self.get_tax_exemptions()
 
+	def get_tax_exemptions(self):
+		# Get category-wise exemptions based on submitted proofs,
+		# or on declarations for employees who haven't submitted any proof
 		max_exemptions = self.get_max_exemptions_based_on_category()
 
-		par = frappe.qb.DocType(source)
-		child = frappe.qb.DocType(child_doctype)
-
-		records = (
-			frappe.qb.from_(par)
-			.inner_join(child)
-			.on(par.name == child.parent)
-			.select(par.employee, child.exemption_category, Sum(child.amount).as_("amount"))
-			.where(par.docstatus == 1)
-			.where(par.employee.isin(list(self.employees.keys())))
-			.where(par.payroll_period == self.filters.payroll_period)
-			.groupby(par.employee, child.exemption_category)
-		).run(as_dict=True)
+		proof = frappe.qb.DocType("Employee Tax Exemption Proof Submission")
+		proof_detail = frappe.qb.DocType("Employee Tax Exemption Proof Submission Detail")
+		query = self.get_tax_exemptions_query(proof, proof_detail)
 
-		for d in records:
-			if not self.employees[d.employee]["allow_tax_exemption"]:
-				continue
+		if self.filters.consider_tax_exemption_declaration:
+			declaration = frappe.qb.DocType("Employee Tax Exemption Declaration")
+			declaration_category = frappe.qb.DocType("Employee Tax Exemption Declaration Category")
+			employees_with_proofs = (
+				frappe.qb.from_(proof)
+				.inner_join(proof_detail)
+				.on(proof.name == proof_detail.parent)
+				.select(proof.employee)
+				.distinct()
+				.where(proof.docstatus == 1)
+				.where(proof.payroll_period == self.filters.payroll_period)
+			)
+			query = query.union_all(
+				self.get_tax_exemptions_query(declaration, declaration_category).where(
+					declaration.employee.notin(employees_with_proofs)
+				)
+			)
 
-			if source == "Employee Tax Exemption Declaration" and d.employee in self.employees_with_proofs:
+		for d in query.run(as_dict=True):
+			emp_details = self.employees[d.employee]
+			if not emp_details["allow_tax_exemption"]:
 				continue
 
 			amount = flt(d.amount)
@@ -332,14 +375,20 @@ class IncomeTaxComputationReport:
 			if max_eligible_amount and amount > max_eligible_amount:
 				amount = max_eligible_amount
 
-			self.employees[d.employee].setdefault(scrub(d.exemption_category), amount)
-			self.employees[d.employee]["total_exemption"] += amount
+			emp_details.setdefault(scrub(d.exemption_category), amount)
+			emp_details["total_exemption"] += amount
 
-			if (
-				source == "Employee Tax Exemption Proof Submission"
-				and d.employee not in self.employees_with_proofs
-			):
-				self.employees_with_proofs.append(d.employee)
+	def get_tax_exemptions_query(self, par, child):
+		return (
+			frappe.qb.from_(par)
+			.inner_join(child)
+			.on(par.name == child.parent)
+			.select(par.employee, child.exemption_category, Sum(child.amount).as_("amount"))
+			.where(par.docstatus == 1)
+			.where(par.employee.isin(self.employee_ids))
+			.where(par.payroll_period == self.filters.payroll_period)
+			.groupby(par.employee, child.exemption_category)
+		)
 
 	def get_max_exemptions_based_on_category(self):
 		return dict(
@@ -357,7 +406,7 @@ class IncomeTaxComputationReport:
 
 		self.add_column("HRA")
 
-		self.employees_with_proofs = []
+		self.employees_with_proofs = set()
 		self.get_eligible_hra("Employee Tax Exemption Proof Submission")
 		if self.filters.consider_tax_exemption_declaration:
 			self.get_eligible_hra("Employee Tax Exemption Declaration")
@@ -372,22 +421,23 @@ class IncomeTaxComputationReport:
 			source,
 			filters={
 				"docstatus": 1,
-				"employee": ["in", list(self.employees.keys())],
+				"employee": ["in", self.employee_ids],
 				"payroll_period": self.filters.payroll_period,
 			},
 			fields=["employee", hra_amount_field],
 			as_list=1,
 		)
 
-		for d in records:
-			if not self.employees[d[0]]["allow_tax_exemption"]:
+		for employee, hra_amount in records:
+			emp_details = self.employees[employee]
+			if not emp_details["allow_tax_exemption"]:
 				continue
 
-			if d[0] not in self.employees_with_proofs:
-				self.employees[d[0]].setdefault("hra", d[1])
+			if employee not in self.employees_with_proofs:
+				emp_details.setdefault("hra", hra_amount)
 
-				self.employees[d[0]]["total_exemption"] += d[1]
-				self.employees_with_proofs.append(d[0])
+				emp_details["total_exemption"] += hra_amount
+				self.employees_with_proofs.add(employee)
 
 	def get_standard_tax_exemption(self):
 		self.add_column("Standard Tax Exemption")
@@ -413,22 +463,21 @@ class IncomeTaxComputationReport:
 	def get_income_from_other_sources(self):
 		self.add_column("Other Income")
 
-		for employee in list(self.employees.keys()):
-			other_income = (
-				frappe.get_all(
-					"Employee Other Income",
-					filters={
-						"employee": employee,
-						"payroll_period": self.filters.payroll_period,
-						"company": self.filters.company,
-						"docstatus": 1,
-					},
-					fields="SUM(amount) as total_amount",
-				)[0].total_amount
-				or 0.0
-			)
+		other_income = frappe.qb.DocType("Employee Other Income")
+		other_income_by_employee = frappe._dict(
+			(
+				frappe.qb.from_(other_income)
+				.select(other_income.employee, Sum(other_income.amount).as_("amount"))
+				.where(other_income.docstatus == 1)
+				.where(other_income.employee.isin(self.employee_ids))
+				.where(other_income.payroll_period == self.filters.payroll_period)
+				.where(other_income.company == self.filters.company)
+				.groupby(other_income.employee)
+			).run()
+		)
 
-			self.employees[employee].setdefault("other_income", other_income)
+		for employee, emp_details in self.employees.items():
+			emp_details.setdefault("other_income", other_income_by_employee.get(employee) or 0.0)
 
 	def get_total_taxable_amount(self):
 		self.add_column("Total Taxable Amount")
@@ -440,17 +489,9 @@ class IncomeTaxComputationReport:
 			last_ss = self.get_last_salary_slip(employee)
 
 			if last_ss and last_ss.end_date == self.payroll_period_end_date:
-				annual_taxable_amount, tax_exemption_declaration, standard_tax_exemption_amount = (
-					frappe.db.get_value(
-						"Salary Slip",
-						last_ss.name,
-						[
-							"annual_taxable_amount",
-							"tax_exemption_declaration",
-							"standard_tax_exemption_amount",
-						],
-					)
-				)
+				annual_taxable_amount = last_ss.annual_taxable_amount
+				tax_exemption_declaration = last_ss.tax_exemption_declaration
+				standard_tax_exemption_amount = last_ss.standard_tax_exemption_amount
 			else:
 				future_salary_slips = self.future_salary_slips.get(employee, [])
 				if future_salary_slips:
@@ -481,10 +522,16 @@ class IncomeTaxComputationReport:
 			"round_to_the_nearest_integer",
 		)
 
+		# only a handful of slabs are shared by all employees, load each of them once
+		tax_slabs = {
+			tax_slab: frappe.get_cached_doc("Income Tax Slab", tax_slab)
+			for tax_slab in {emp_details.get("income_tax_slab") for emp_details in self.employees.values()}
+			if tax_slab
+		}
+
 		for emp, emp_details in self.employees.items():
-			tax_slab = emp_details.get("income_tax_slab")
+			tax_slab = tax_slabs.get(emp_details.get("income_tax_slab"))
 			if tax_slab:
-				tax_slab = frappe.get_cached_doc("Income Tax Slab", tax_slab)
 				eval_globals, eval_locals = self.get_data_for_eval(emp, emp_details)
 				tax_amount, other_taxes_and_charges = calculate_tax_by_tax_slab(
 					emp_details["total_taxable_amount"],
@@ -514,12 +561,12 @@ class IncomeTaxComputationReport:
 			salary_slip.employee = emp
 			salary_slip.salary_structure = emp_details.salary_structure
 			salary_slip.start_date = max(self.payroll_period_start_date, emp_details.date_of_joining)
-			salary_slip.payroll_frequency = frappe.db.get_value(
+			salary_slip.payroll_frequency = frappe.get_cached_value(
 				"Salary Structure", emp_details.salary_structure, "payroll_frequency"
 			)
-			salary_slip.end_date = get_start_end_dates(
+			salary_slip.end_date = self.get_salary_slip_end_date(
 				salary_slip.payroll_frequency, salary_slip.start_date
-			).end_date
+			)
 			salary_slip.process_salary_structure()
 
 		eval_locals, __ = salary_slip.get_data_for_eval()
@@ -552,7 +599,7 @@ class IncomeTaxComputationReport:
 			.on(ss.name == ss_ded.parent)
 			.select(ss.employee, Sum(ss_ded.amount).as_("amount"))
 			.where(ss.docstatus == 1)
-			.where(ss.employee.isin(list(self.employees.keys())))
+			.where(ss.employee.isin(self.employee_ids))
 			.where(ss_ded.salary_component.isin(tax_components))
 			.where(ss_ded.parentfield == "deductions")
 			.where(ss.start_date >= self.payroll_period_start_date)
@@ -561,8 +608,9 @@ class IncomeTaxComputationReport:
 		).run(as_dict=True)
 
 		for d in records:
-			total_tax_deducted = flt(self.employees[d.employee].get("tax_deducted_till_date", 0)) + d.amount
-			self.employees[d.employee].setdefault("total_tax_deducted", total_tax_deducted)
+			emp_details = self.employees[d.employee]
+			total_tax_deducted = flt(emp_details.get("tax_deducted_till_date", 0)) + d.amount
+			emp_details.setdefault("total_tax_deducted", total_tax_deducted)
 
 	def get_payable_tax(self):
 		self.add_column("Payable Tax")
@@ -8,12 +8,20 @@ from hrms.payroll.doctype.employee_tax_exemption_declaration.test_employee_tax_e
 	create_payroll_period,
 )
 from hrms.payroll.doctype.salary_slip.test_salary_slip import (
+	create_employee_other_income,
 	create_exemption_declaration,
+	create_proof_submission,
 	create_salary_slips_for_payroll_period,
 	create_tax_slab,
 )
-from hrms.payroll.doctype.salary_structure.test_salary_structure import make_salary_structure
-from hrms.payroll.report.income_tax_computation.income_tax_computation import execute
+from hrms.payroll.doctype.salary_structure.test_salary_structure import (
+	create_salary_structure_assignment,
+	make_salary_structure,
+)
+from hrms.payroll.report.income_tax_computation.income_tax_computation import (
+	IncomeTaxComputationReport,
+	execute,
+)
 
 
 class TestIncomeTaxComputation(FrappeTestCase):
@@ -26,6 +34,8 @@ class TestIncomeTaxComputation(FrappeTestCase):
 
 	def cleanup_records(self):
 		frappe.db.sql("delete from `tabEmployee Tax Exemption Declaration`")
+		frappe.db.sql("delete from `tabEmployee Tax Exemption Proof Submission`")
+		frappe.db.sql("delete from `tabEmployee Other Income`")
 		frappe.db.sql("delete from `tabPayroll Period`")
 		frappe.db.sql("delete from `tabIncome Tax Slab`")
 		frappe.db.sql("delete from `tabSalary Component`")
@@ -49,7 +59,7 @@ class TestIncomeTaxComputation(FrappeTestCase):
 			effective_date=getdate("2019-04-01"),
 			company="_Test Company",
 		)
-		salary_structure = make_salary_structure(
+		self.salary_structure = make_salary_structure(
 			"Monthly Salary Structure Test Income Tax Computation",
 			"Monthly",
 			employee=self.employee,
@@ -62,7 +72,7 @@ class TestIncomeTaxComputation(FrappeTestCase):
 		create_exemption_declaration(self.employee, self.payroll_period.name)
 
 		create_salary_slips_for_payroll_period(
-			self.employee, salary_structure.name, self.payroll_period, deduct_random=False, num=3
+			self.employee, self.salary_structure.name, self.payroll_period, deduct_random=False, num=3
 		)
 
 	def test_report(self):
@@ -111,3 +121,53 @@ class TestIncomeTaxComputation(FrappeTestCase):
 
 		for key, val in expected_data.items():
 			self.assertEqual(result[1][0].get(key), val)
+
+	def test_proof_submission_overrides_declaration(self):
+		create_proof_submission(self.employee, self.payroll_period, 40000)
+
+		filters = frappe._dict(
+			{
+				"company": "_Test Company",
+				"payroll_period": self.payroll_period.name,
+				"employee": self.employee,
+				"consider_tax_exemption_declaration": 1,
+			}
+		)
+
+		result = execute(filters)
+
+		# declared amount (100000) is ignored once the employee has submitted proofs
+		self.assertEqual(result[1][0].get("_test_category"), 40000.0)
+		self.assertEqual(result[1][0].get("total_exemption"), 92400.0)
+
+	def test_report_for_multiple_employees(self):
+		employee = make_employee(
+			"employee_tax_computation_2@example.com",
+			company="_Test Company",
+			date_of_joining=getdate("01-10-2021"),
+		)
+		create_salary_structure_assignment(
+			employee,
+			self.salary_structure.name,
+			company="_Test Company",
+			currency="INR",
+			payroll_period=self.payroll_period,
+		)
+		create_salary_slips_for_payroll_period(
+			employee, self.salary_structure.name, self.payroll_period, deduct_random=False, num=1
+		)
+		create_employee_other_income(employee, self.payroll_period.name, company="_Test Company")
+
+		report = IncomeTaxComputationReport(
+			{"company": "_Test Company", "payroll_period": self.payroll_period.name}
+		)
+		report.run()
+
+		for emp in (self.employee, employee):
+			last_salary_slip = frappe.db.get_value(
+				"Salary Slip", {"employee": emp, "docstatus": 1}, "name", order_by="start_date desc"
+			)
+			self.assertEqual(report.get_last_salary_slip(emp).name, last_salary_slip)
+
+		self.assertEqual(report.employees[self.employee].other_income, 0.0)
+		self.assertEqual(report.employees[employee].other_income, 10000.0)